@@ -2,6 +2,8 @@
 Phy2HTML
 """
 
+import os
+import time
 from math import trunc
 from typing import Tuple
 import tree_utils
@@ -107,7 +109,8 @@ def total_rows_per_node(n: int, rows_per_tip: int) -> int:
 
 
 def tree_recursion(tree, min_col: int, max_col: int, min_row: int, max_row: int, taxa: list, branches: list,
-                   vlines: list, rows_per_tip: int, label_branches: bool, scale_branches: bool, scale: float) -> int:
+                   vlines: list, rows_per_tip: int, label_branches: bool, scale_branches: bool, scale: float,
+                   tip_counts: dict) -> int:
     """
     calculate positions of taxa, branches, and vertical connectors on subtrees
     """
@@ -136,12 +139,12 @@ def tree_recursion(tree, min_col: int, max_col: int, min_row: int, max_row: int,
             """
             calculate the total rows for each descendant based on the number of tips of the descendant
             """
-            ndd = d.n_tips()
+            ndd = tip_counts[d]
             d_rows = total_rows_per_node(ndd, rows_per_tip)
             bottom_row = top_row + d_rows - 1
             # draw the descendant in its own smaller bounded box
             row = tree_recursion(d, min_col + col_span, max_col, top_row, bottom_row, taxa, branches, vlines,
-                                 rows_per_tip, label_branches, scale_branches, scale)
+                                 rows_per_tip, label_branches, scale_branches, scale, tip_counts)
             """
             the rows of the first and last descendants represent the positions to draw the vertical line 
             connecting all of the descendants
@@ -183,6 +186,8 @@ def tree_recursion(tree, min_col: int, max_col: int, min_row: int, max_row: int,
     if col_span > 0:
         new_branch = Branch(min_col+1, col_span, row)
         branches.append(new_branch)
+        if tree.label != "":
+            new_branch.label = tree.label
         if label_branches:
             new_branch.label = "branch" + str(len(branches))
 
@@ -200,7 +205,7 @@ def calculate_tree(tree: tree_utils.Node, nrows: int, ncols: int, rows_per_tip:
     else:
         scale = 1
     tree_recursion(tree, 1, ncols, 1, nrows, taxa, branches, vlines, rows_per_tip, label_branches, scale_branches,
-                   scale)
+                   scale, tree_utils.subtree_tip_counts(tree))
     return taxa, branches, vlines
 
 
@@ -209,29 +214,61 @@ def add_node_depth(tree: tree_utils.Node, max_depth: int) -> None:
     add the column depth of each node on the tree, where the root is column 1 and the tips are column x - 1
     where x is the last column which will contain the tip names
     """
-    tree.node_depth = max_depth - tree.max_node_tip_count()
-    for d in tree.descendants:
-        add_node_depth(d, max_depth)
+    tip_node_counts = dict()
+    for node in tree_utils.postorder_nodes(tree):
+        tip_node_counts[node] = 1 + max((tip_node_counts[d] for d in node.descendants), default=0)
+        node.node_depth = max_depth - tip_node_counts[node]
 
 
-def create_html_tree(inname: str, outname: str, col_width: str = "40px", row_height: str = "10px",
-                     name_width: str = "200px", prefix: str = "", label_branches: bool = False,
-                     scale_branches: bool = False, tree_cols: int = 1, rows_per_tip: int = 2,
-                     verbose: bool = True) -> list:
-    with open(inname, "r") as infile:
-        newick_str = infile.read()
-    newick_str = newick_str[:newick_str.find(";")+1]
-    newick_str.replace("\n", "")
-    if verbose:
-        print()
-        print("Input file: " + inname)
-        print("Imported Tree String: ", newick_str)
-        print()
-    tree = tree_utils.read_newick_tree(newick_str)
-    if verbose:
-        print("File read successfully.")
-        print("Tree contains", tree.n_tips(), "tips.")
-        print()
+def read_tree(inname: str, verbose: bool = True, consensus: bool = False) -> tree_utils.Node:
+    if consensus:
+        """
+        stream every tree in the file into a majority-rule consensus tree, with clade support as branch labels
+        """
+        if verbose:
+            print()
+            print("Input file: " + inname)
+            print()
+        with open(inname, "r") as infile:
+            tree = tree_utils.majority_rule_consensus(tree_utils.read_newick_tree(t)
+                                                      for t in tree_utils.iterate_newick_strings(infile))
+        if verbose:
+            print("Majority-rule consensus tree built successfully.")
+    else:
+        with open(inname, "r") as infile:
+            newick_str = infile.read()
+        newick_str = newick_str[:newick_str.find(";")+1]
+        newick_str.replace("\n", "")
+        if verbose:
+            print()
+            print("Input file: " + inname)
+            print("Imported Tree String: ", newick_str)
+            print()
+        tree = tree_utils.read_newick_tree(newick_str)
+        if verbose:
+            print("File read successfully.")
+    return tree
+
+
+def prepare_tree(tree: tree_utils.Node, prune: tuple = (), reroot: str = "", reroot_on_branch: bool = True,
+                 ladderize: bool = False) -> tree_utils.Node:
+    if len(prune) > 0:
+        tree = tree_utils.prune_tips(tree, prune)
+    if reroot != "":
+        if reroot_on_branch:
+            tree = tree_utils.reroot_on_branch(tree_utils.find_node(tree, reroot))
+        else:
+            tree = tree_utils.reroot(tree_utils.find_node(tree, reroot))
+    if ladderize:
+        tree_utils.ladderize(tree)
+    return tree
+
+
+def layout_tree(tree: tree_utils.Node, label_branches: bool = False, scale_branches: bool = False,
+                tree_cols: int = 1, rows_per_tip: int = 2) -> Tuple[int, int, list, list, list]:
+    """
+    calculate the grid size and the positions of all taxa, branches, and vertical connectors of the tree
+    """
     ntips = tree.n_tips()
     nrows = total_rows_per_node(ntips, rows_per_tip)
     if scale_branches:
@@ -240,6 +277,12 @@ def create_html_tree(inname: str, outname: str, col_width: str = "40px", row_hei
         ncols = tree.max_node_tip_count() + 1
         add_node_depth(tree, ncols+1)
     taxa, branches, vlines = calculate_tree(tree, nrows, ncols, rows_per_tip, label_branches, scale_branches)
+    return nrows, ncols, taxa, branches, vlines
+
+
+def render_html(layout: Tuple[int, int, list, list, list], col_width: str = "40px", row_height: str = "10px",
+                name_width: str = "200px", prefix: str = "", scale_branches: bool = False) -> list:
+    nrows, ncols, taxa, branches, vlines = layout
     outlist = []
     start_html(outlist)
     write_style_to_head(outlist, nrows, ncols, taxa, branches, vlines, col_width, row_height, name_width, prefix,
@@ -247,6 +290,36 @@ def create_html_tree(inname: str, outname: str, col_width: str = "40px", row_hei
     end_head_section(outlist)
     write_tree_to_body(outlist, taxa, branches, vlines, prefix)
     end_html(outlist)
+    return outlist
+
+
+def write_if_changed(outname: str, outlist: list) -> bool:
+    """
+    write the html to the output file only if its bytes differ from what the file already contains, returning
+    whether the file was written
+    """
+    new_html = "".join(outlist).encode()
+    if os.path.isfile(outname):
+        with open(outname, "rb") as infile:
+            if infile.read() == new_html:
+                return False
+    with open(outname, "wb") as outfile:
+        outfile.write(new_html)
+    return True
+
+
+def create_html_tree(inname: str, outname: str, col_width: str = "40px", row_height: str = "10px",
+                     name_width: str = "200px", prefix: str = "", label_branches: bool = False,
+                     scale_branches: bool = False, tree_cols: int = 1, rows_per_tip: int = 2,
+                     verbose: bool = True, consensus: bool = False, prune: tuple = (), reroot: str = "",
+                     reroot_on_branch: bool = True, ladderize: bool = False) -> list:
+    tree = read_tree(inname, verbose, consensus)
+    tree = prepare_tree(tree, prune, reroot, reroot_on_branch, ladderize)
+    if verbose:
+        print("Tree contains", tree.n_tips(), "tips.")
+        print()
+    layout = layout_tree(tree, label_branches, scale_branches, tree_cols, rows_per_tip)
+    outlist = render_html(layout, col_width, row_height, name_width, prefix, scale_branches)
     if outname != "":  # if output file name is provided, write to file
         with open(outname, "w") as outfile:
             outfile.writelines(outlist)
@@ -255,6 +328,157 @@ def create_html_tree(inname: str, outname: str, col_width: str = "40px", row_hei
     return outlist
 
 
+class TreeWatcher:
+    """
+    Keeps parsed trees and their layouts in memory so that tree files can be re-rendered incrementally as they
+    change. Files are polled by modification time and size, so no external dependencies are needed.
+
+    paths may contain tree files and/or directories, in which case every file in the directory with one of
+    the tree_extensions is watched. Each tree is written to an HTML file of the same name unless outname is given
+    for a single watched file. All other keyword arguments are the options of create_html_tree().
+    """
+    tree_extensions = (".nwk", ".newick", ".tre", ".tree")
+    tree_option_names = ("consensus", "prune", "reroot", "reroot_on_branch", "ladderize")
+    layout_option_names = ("label_branches", "scale_branches", "tree_cols", "rows_per_tip")
+    render_option_names = ("col_width", "row_height", "name_width", "prefix", "scale_branches")
+
+    def __init__(self, paths: list, outname: str = "", verbose: bool = True, **options):
+        self.paths = paths
+        self.outname = outname
+        self.verbose = verbose
+        self.options = options
+        self.signatures = dict()
+        self.trees = dict()
+        self.layouts = dict()
+        self.latency = 0.0
+
+    def watched_files(self) -> list:
+        files = []
+        for path in self.paths:
+            if os.path.isdir(path):
+                for entry in sorted(os.scandir(path), key=lambda e: e.name):
+                    if entry.is_file() and os.path.splitext(entry.name)[1].lower() in self.tree_extensions:
+                        files.append(entry.path)
+            else:
+                files.append(path)
+        return files
+
+    def output_name(self, inname: str) -> str:
+        if self.outname != "" and len(self.paths) == 1 and not os.path.isdir(self.paths[0]):
+            return self.outname
+        return os.path.splitext(inname)[0] + ".html"
+
+    def changed_files(self) -> list:
+        """
+        return the watched files whose modification time or size has changed since the last poll, and forget any
+        files which have disappeared
+        """
+        changed = []
+        current = dict()
+        for inname in self.watched_files():
+            try:
+                stat = os.stat(inname)
+            except OSError:
+                continue
+            current[inname] = (stat.st_mtime_ns, stat.st_size)
+            if self.signatures.get(inname) != current[inname]:
+                changed.append(inname)
+        for inname in list(self.signatures):
+            if inname not in current:
+                self.trees.pop(inname, None)
+                self.layouts.pop(inname, None)
+        self.signatures = current
+        return changed
+
+    def update(self, inname: str, reload: bool = True) -> bool:
+        """
+        re-render a single tree file, reparsing it only if reload is True and recalculating its layout only if
+        the layout options have changed since it was last drawn. returns whether the output file was rewritten
+        """
+        tree_key = tuple(self.options.get(k) for k in self.tree_option_names)
+        layout_key = tuple(self.options.get(k) for k in self.layout_option_names)
+        if reload or inname not in self.trees or self.trees[inname][0] != tree_key:
+            tree = read_tree(inname, False, self.options.get("consensus", False))
+            tree = prepare_tree(tree, **{k: self.options[k] for k in self.tree_option_names[1:]
+                                         if k in self.options})
+            self.trees[inname] = (tree_key, tree)
+            self.layouts.pop(inname, None)
+        if inname not in self.layouts or self.layouts[inname][0] != layout_key:
+            tree = self.trees[inname][1]
+            layout = layout_tree(tree, **{k: self.options[k] for k in self.layout_option_names if k in self.options})
+            self.layouts[inname] = (layout_key, layout)
+        outlist = render_html(self.layouts[inname][1], **{k: self.options[k] for k in self.render_option_names
+                                                          if k in self.options})
+        return write_if_changed(self.output_name(inname), outlist)
+
+    def redraw(self, innames: list, reload: bool = True) -> int:
+        """
+        re-render each of the listed tree files, returning the number of output files rewritten. a file which
+        cannot be drawn is reported and dropped from the cache, so it is reparsed the next time it is drawn
+        """
+        nwritten = 0
+        for inname in innames:
+            try:
+                if self.update(inname, reload):
+                    nwritten += 1
+                    if self.verbose:
+                        print("HTML file updated: " + self.output_name(inname))
+            except Exception as err:  # a file caught mid-save or a bad option should not stop the watch
+                self.trees.pop(inname, None)
+                self.layouts.pop(inname, None)
+                if self.verbose:
+                    print("Could not draw {}: {}".format(inname, err))
+        return nwritten
+
+    def set_options(self, **options) -> Tuple[int, int, float]:
+        """
+        change drawing options and re-render every watched tree, reusing the parsed trees and, if only the render
+        options have changed, their layouts. returns the number of files redrawn, the number of output files
+        rewritten, and the latency in seconds, which is also kept in self.latency
+        """
+        start_time = time.perf_counter()
+        self.options.update(options)
+        innames = list(self.signatures)
+        nwritten = self.redraw(innames, reload=False)
+        self.latency = time.perf_counter() - start_time
+        if self.verbose:
+            print("Options changed, {} output file(s) rewritten in {:0.1f} ms".format(nwritten, self.latency * 1000))
+        return len(innames), nwritten, self.latency
+
+    def cycle(self) -> Tuple[int, int, float]:
+        """
+        poll the watched files once and re-render those which changed, returning the number of changed files,
+        the number of output files rewritten, and the latency of the cycle in seconds, which is also kept in
+        self.latency. the latency is only printed for cycles in which some file changed
+        """
+        start_time = time.perf_counter()
+        changed = self.changed_files()
+        nwritten = self.redraw(changed)
+        self.latency = time.perf_counter() - start_time
+        if self.verbose and len(changed) > 0:
+            print("{} file(s) changed, {} output file(s) rewritten in {:0.1f} ms".format(len(changed), nwritten,
+                                                                                         self.latency * 1000))
+        return len(changed), nwritten, self.latency
+
+    def watch(self, interval: float = 1.0, max_cycles: int = 0) -> None:
+        """
+        poll every interval seconds until interrupted (or for max_cycles polls, if positive)
+        """
+        if self.verbose:
+            print("Watching for changes (press Ctrl+C to stop)")
+        ncycles = 0
+        try:
+            while True:
+                self.cycle()
+                ncycles += 1
+                if 0 < max_cycles <= ncycles:
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            if self.verbose:
+                print("Stopped watching")
+
+
 def query_user(prompt: str, default: str) -> str:
     x = input("{} [default={}]: ".format(prompt, default))
     if x == "":
@@ -266,6 +490,19 @@ def main():
     # get input parameters
     inname = query_user("Name of tree file", "fiddler_tree.nwk")
     outname = query_user("Name of output HTML file", "test_tree.html")
+    consensus = query_user("Draw majority-rule consensus of all trees in file [Y/N]", "N")
+    if consensus.lower() == "y":
+        consensus = True
+    else:
+        consensus = False
+    prune = query_user("(Optional) Comma-separated tips to prune", "")
+    prune = tuple(t.strip() for t in prune.split(",") if t.strip() != "")
+    reroot = query_user("(Optional) Name of outgroup to root the tree on", "")
+    ladderize = query_user("Ladderize tree [Y/N]", "N")
+    if ladderize.lower() == "y":
+        ladderize = True
+    else:
+        ladderize = False
     scale_branches = query_user("Scale branch lengths [Y/N]", "N")
     tree_cols = 0
     if scale_branches.lower() == "y":
@@ -290,8 +527,17 @@ def main():
         label_branches = True
     else:
         label_branches = False
-    create_html_tree(inname, outname, col_width, row_height, name_width, prefix, label_branches, scale_branches,
-                     tree_cols)
+    watch = query_user("Watch tree file for changes and redraw [Y/N]", "N")
+    if watch.lower() == "y":
+        watcher = TreeWatcher([inname], outname, col_width=col_width, row_height=row_height, name_width=name_width,
+                              prefix=prefix, label_branches=label_branches, scale_branches=scale_branches,
+                              tree_cols=tree_cols, consensus=consensus, prune=prune, reroot=reroot,
+                              ladderize=ladderize)
+        watcher.watch()
+    else:
+        create_html_tree(inname, outname, col_width, row_height, name_width, prefix, label_branches,
+                         scale_branches, tree_cols, consensus=consensus, prune=prune, reroot=reroot,
+                         ladderize=ladderize)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,89 @@
+"""
+Basic checks of the tree manipulation functions in tree_utils
+
+Run with pytest, or directly with python
+"""
+
+import tree_utils
+
+
+def consensus_of(tree_strs: list) -> tree_utils.Node:
+    return tree_utils.majority_rule_consensus(tree_utils.read_newick_tree(t) for t in tree_strs)
+
+
+def test_consensus_support():
+    tree = consensus_of(["(((A,B),C),D);", "(((A,B),C),D);", "((A,(B,C)),D);"])
+    assert tree.output_newick("") == "(((A,B),C),D);"
+    labels = [node.label for node in tree_utils.postorder_nodes(tree) if node.n_descendants() > 0]
+    assert labels == ["67", "100", ""]
+
+
+def test_consensus_branch_lengths():
+    tree = consensus_of(["((A:1,B:1):2,(C:1,D:1):2);", "((A:1,B:3):2,(C:1,D:1):2);", "((A:1,C:1):1,(B:1,D:1):1);"])
+    assert tree.output_newick("g") == "((A:1,B:1.66667):2,(C:1,D:1):2):1;"
+
+
+def test_consensus_unresolved():
+    assert consensus_of(["((A,B),(C,D));", "((A,C),(B,D));"]).output_newick("") == "(A,B,C,D);"
+
+
+def test_consensus_unary_nodes():
+    assert consensus_of(["((A:1,B:1):2):3;", "(A:1,B:1):5;"]).output_newick("g") == "(A:1,B:1):5;"
+
+
+def test_consensus_duplicate_tips():
+    try:
+        consensus_of(["((A,B),C);", "((A,A),(B,C));"])
+    except ValueError:
+        return
+    assert False, "duplicate tip names in a later tree were not rejected"
+
+
+def test_consensus_deep_tree():
+    tree_str = "t0"
+    for i in range(1, 1500):
+        tree_str = "({},t{})".format(tree_str, i)
+    tree = consensus_of([tree_str + ";"] * 3)
+    assert len([node for node in tree_utils.postorder_nodes(tree) if node.n_descendants() == 0]) == 1500
+
+
+def test_reroot_on_branch():
+    tree = tree_utils.read_newick_tree("(((A:1,B:2):3,C:4):5,(D:6,E:7):8);")
+    tree = tree_utils.reroot_on_branch(tree_utils.find_node(tree, "A"))
+    assert tree.output_newick("g") == "(A:0.5,(B:2,(C:4,(D:6,E:7):13):3):0.5):1;"
+    assert tree.ancestor is None
+
+
+def test_reroot_unary_root():
+    tree = tree_utils.read_newick_tree("(((A:1,B:1):1,C:1):1);")
+    tree = tree_utils.reroot_on_branch(tree_utils.find_node(tree, "A"))
+    assert tree.output_newick("g") == "(A:0.5,(B:1,C:2):0.5):1;"
+
+
+def test_reroot_on_node():
+    tree = tree_utils.read_newick_tree("((A:1,B:2)X:3,(C:1,(D:1,E:1):2):4):0;")
+    tree = tree_utils.reroot(tree_utils.find_node(tree, "X"))
+    assert tree.output_newick("g") == "(A:1,B:2,(C:1,(D:1,E:1):2):7):0;"
+
+
+def test_prune_to_unary_root():
+    tree = tree_utils.read_newick_tree("((A:1,B:2):3,C:4):0;")
+    assert tree_utils.prune_tips(tree, ["C"]).output_newick("g") == "(A:1,B:2):3;"
+
+
+def test_prune_collapses_unary_nodes():
+    tree = tree_utils.read_newick_tree("((A:1,B:2):3,((C:1,D:1):1,E:2):4):0;")
+    assert tree_utils.prune_tips(tree, ["A", "C", "D"]).output_newick("g") == "(B:5,E:6):0;"
+
+
+def test_ladderize():
+    tree = tree_utils.read_newick_tree("((C,(D,E)),(A,B));")
+    assert tree_utils.ladderize(tree).output_newick("") == "((A,B),(C,(D,E)));"
+    assert tree_utils.ladderize(tree, False).output_newick("") == "(((D,E),C),(A,B));"
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(name, "passed")
@@ -8,6 +8,7 @@ rooted and is not reticulate
 
 """
 
+from typing import Iterable, Iterator
 import tree_turtle
 
 
@@ -23,6 +24,7 @@ class Node:
         self.__ancestor = None
         self.__descendants = list()
         self.__node_depth = 0
+        self.__label = ""
 
     @property
     def name(self) -> str:
@@ -54,6 +56,17 @@ class Node:
     def node_depth(self, value: int) -> None:
         self.__node_depth = value
 
+    @property
+    def label(self) -> str:
+        """
+        An optional label for the branch connecting the node to its ancestor (e.g., a clade support value)
+        """
+        return self.__label
+
+    @label.setter
+    def label(self, value: str) -> None:
+        self.__label = value
+
     @property
     def descendants(self) -> list:
         return self.__descendants
@@ -281,6 +294,311 @@ def read_newick_tree(tree_str: str) -> Node:
     return root_node
 
 
+def iterate_newick_strings(infile) -> Iterator[str]:
+    """
+    Read a file containing one or more trees in Newick format and yield the string for each tree, one at a time.
+    The file is read line by line, so only one line plus any unfinished tree is held in memory at once (a file
+    with every tree on a single line is therefore read whole). Line breaks within a tree are removed.
+    """
+    buffer = []
+    for line in infile:
+        pos = line.find(";")
+        while pos >= 0:
+            buffer.append(line[:pos+1])
+            tree_str = "".join(buffer).replace("\n", "").replace("\r", "").strip()
+            if tree_str != ";":
+                yield tree_str
+            buffer = []
+            line = line[pos+1:]
+            pos = line.find(";")
+        buffer.append(line)
+
+
+def postorder_nodes(tree: Node) -> list:
+    """
+    return a list of every node of the tree in postorder (descendants before ancestors, left to right), without
+    recursion
+    """
+    order = []
+    stack = [tree]
+    while len(stack) > 0:
+        node = stack.pop()
+        order.append(node)
+        stack.extend(node.descendants)
+    order.reverse()
+    return order
+
+
+def clade_bitmasks(tree: Node, tip_index: dict) -> list:
+    """
+    return a list of (node, bitmask, number of tips) for every node of the tree, in postorder. each clade is
+    encoded as an integer with bit i set if the tip whose name maps to i in tip_index is a descendant of the node.
+    a ValueError is raised if the tree does not have exactly one tip for every entry of tip_index
+    """
+    result = []
+    masks = dict()
+    sizes = dict()
+    stack = [(tree, False)]
+    while len(stack) > 0:
+        node, visited = stack.pop()
+        if node.n_descendants() == 0:
+            if node.name not in tip_index:
+                raise ValueError("Tip \"{}\" is not found in the first tree".format(node.name))
+            mask = 1 << tip_index[node.name]
+            size = 1
+        elif not visited:
+            stack.append((node, True))
+            for d in reversed(node.descendants):
+                stack.append((d, False))
+            continue
+        else:
+            mask = 0
+            size = 0
+            for d in node.descendants:
+                mask |= masks.pop(d)
+                size += sizes.pop(d)
+        masks[node] = mask
+        sizes[node] = size
+        result.append((node, mask, size))
+    if sizes[tree] != len(tip_index) or masks[tree] != (1 << len(tip_index)) - 1:
+        raise ValueError("Tree does not contain exactly one of each tip of the first tree")
+    return result
+
+
+def majority_rule_consensus(trees: Iterable[Node]) -> Node:
+    """
+    Construct the majority-rule consensus of a set of rooted trees which share the same tips, returning the
+    node representing the root of the consensus tree.
+
+    Clades are encoded as bitmasks over the tip order of the first tree and counted in a dictionary while
+    streaming through the trees, so the trees are never held in memory at the same time. Each node costs one
+    OR, hash, and comparison of its mask, so counting takes O(total nodes x ntips/64) word operations. Nodes with
+    a single descendant are collapsed into it. Building the consensus tree afterwards attaches each node to its
+    ancestor once, using a union-find over the tips, so it takes O(consensus nodes x ntips/64) word operations
+    regardless of the number of trees. Every clade found in more than half of the trees is kept;
+    the label of each internal node is its support, as the percentage of trees containing the clade, and branch
+    lengths are averaged over the trees containing the clade.
+    """
+    tip_names = None
+    tip_index = dict()
+    all_tips = 0
+    clade_counts = dict()
+    clade_lengths = dict()
+    clade_sizes = dict()
+    ntrees = 0
+    for tree in trees:
+        if tip_names is None:
+            tip_names = [node.name for node in postorder_nodes(tree) if node.n_descendants() == 0]
+            tip_index = {name: i for i, name in enumerate(tip_names)}
+            if len(tip_index) != len(tip_names):
+                raise ValueError("Tip names must be unique to build a consensus tree")
+            all_tips = (1 << len(tip_names)) - 1
+        ntrees += 1
+        previous_mask = 0
+        for node, mask, size in clade_bitmasks(tree, tip_index):
+            if mask == previous_mask:
+                # a node with a single descendant immediately follows it in postorder and shares its clade, so
+                # only its branch length is added
+                clade_lengths[mask] += node.branch_length
+                continue
+            if mask not in clade_counts:
+                clade_sizes[mask] = size
+            clade_counts[mask] = clade_counts.get(mask, 0) + 1
+            clade_lengths[mask] = clade_lengths.get(mask, 0) + node.branch_length
+            previous_mask = mask
+        if clade_counts.get(all_tips, 0) != ntrees:
+            raise ValueError("Tree {} does not contain the same tips as the first tree".format(ntrees))
+    if ntrees == 0:
+        raise ValueError("No trees found to build a consensus tree")
+
+    """
+    majority clades are always mutually compatible, so adding them from smallest to largest means the largest
+    clade already built which contains a given tip of a new clade lies entirely within it. a union-find over the
+    tips tracks the node of the largest clade built so far for each tip, so each new clade attaches its maximal
+    subclades one at a time, removing each from its mask. clades are bucketed by size to avoid a sort
+    """
+    ntips = len(tip_names)
+    clades_by_size = [[] for _ in range(ntips + 1)]
+    for mask, count in clade_counts.items():
+        if 2*count > ntrees and mask != all_tips:
+            clades_by_size[clade_sizes[mask]].append(mask)
+    clades_by_size[ntips].append(all_tips)
+    parent = list(range(ntips))
+    component_nodes = [None] * ntips
+    component_masks = [0] * ntips
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for size in range(1, ntips + 1):
+        for mask in clades_by_size[size]:
+            new_node = Node()
+            if mask == all_tips:
+                new_node.branch_length = clade_lengths[mask] / ntrees
+            else:
+                new_node.branch_length = clade_lengths[mask] / clade_counts[mask]
+            if size == 1:
+                merged = (mask & -mask).bit_length() - 1
+                new_node.name = tip_names[merged]
+            else:
+                if mask != all_tips:
+                    new_node.label = str(round(100 * clade_counts[mask] / ntrees))
+                merged = None
+                remaining = mask
+                while remaining != 0:
+                    component = find((remaining & -remaining).bit_length() - 1)
+                    new_node.add_child(component_nodes[component])
+                    remaining &= ~component_masks[component]
+                    if merged is None:
+                        merged = component
+                    else:
+                        parent[component] = merged
+            component_nodes[merged] = new_node
+            component_masks[merged] = mask
+    return component_nodes[find(0)]
+
+
+def find_node(tree: Node, name: str) -> Node:
+    """
+    return the first node of the tree with the queried name
+    """
+    for node in postorder_nodes(tree):
+        if node.name == name:
+            return node
+    raise ValueError("Node \"{}\" is not found in the tree".format(name))
+
+
+def subtree_tip_counts(tree: Node) -> dict:
+    """
+    return a dictionary of the number of tips descended from every node of the tree, calculated in a single
+    postorder pass rather than with n_tips() for every node
+    """
+    tip_counts = dict()
+    for node in postorder_nodes(tree):
+        if node.n_descendants() == 0:
+            tip_counts[node] = 1
+        else:
+            tip_counts[node] = sum(tip_counts[d] for d in node.descendants)
+    return tip_counts
+
+
+def ladderize(tree: Node, ascending: bool = True) -> Node:
+    """
+    sort the descendants of every node by the number of tips they contain, smallest first if ascending is True
+    """
+    tip_counts = subtree_tip_counts(tree)
+    for node in tip_counts:
+        node.descendants.sort(key=tip_counts.__getitem__, reverse=not ascending)
+    return tree
+
+
+def prune_tips(tree: Node, names: Iterable[str]) -> Node:
+    """
+    remove all tips with the listed names from the tree in a single postorder pass, returning the (possibly new)
+    root. internal nodes left without descendants are removed and nodes left with a single descendant are
+    collapsed, with their branch length added to that of the descendant. names not found on the tree are ignored
+    """
+    names = set(names)
+    removed = set()
+    for node in postorder_nodes(tree):
+        if node.n_descendants() == 0:
+            if node.name in names:
+                removed.add(node)
+            continue
+        kept = []
+        for d in node.descendants:
+            if d in removed:
+                continue
+            if d.n_descendants() == 1:  # unary nodes have already had their own descendants collapsed
+                g = d.descendants[0]
+                g.branch_length += d.branch_length
+                if g.label == "":
+                    g.label = d.label
+                g.ancestor = node
+                d = g
+            kept.append(d)
+        node.descendants[:] = kept
+        if len(kept) == 0:
+            removed.add(node)
+    if tree in removed:
+        raise ValueError("Cannot prune every tip from the tree")
+    while tree.n_descendants() == 1:
+        child = tree.descendants[0]
+        child.branch_length += tree.branch_length
+        child.ancestor = None
+        tree = child
+    return tree
+
+
+def reroot(new_root: Node) -> Node:
+    """
+    reroot the tree on an internal node by reversing the path between it and the current root, returning the new
+    root. branch lengths and labels move with the branches they belong to and the new root keeps the old root's
+    own branch length. if the old root had a single descendant it is left without descendants and is removed;
+    whichever node is then left with a single descendant (the old root or its former descendant) is collapsed
+    """
+    if new_root.n_descendants() == 0:
+        raise ValueError("Cannot root on a tip; root on its branch with reroot_on_branch() instead")
+    path = []
+    node = new_root
+    while node is not None:
+        path.append(node)
+        node = node.ancestor
+    old_root = path[-1]
+    if old_root == new_root:
+        return new_root
+    stem_length = old_root.branch_length
+    stem_label = old_root.label
+    for i in range(len(path)-1, 0, -1):  # work down from the old root, reversing one branch at a time
+        parent = path[i]
+        child = path[i-1]
+        parent.descendants.remove(child)
+        child.add_child(parent)
+        parent.branch_length = child.branch_length
+        parent.label = child.label
+    new_root.ancestor = None
+    new_root.branch_length = stem_length
+    new_root.label = stem_label
+    node = old_root
+    if node.n_descendants() == 0:  # the old root had a single descendant, so it is now an empty tip
+        node.ancestor.descendants.remove(node)
+        node = node.ancestor
+    if node != new_root and node.n_descendants() == 1:
+        g = node.descendants[0]
+        anc = node.ancestor
+        anc.descendants[anc.descendants.index(node)] = g
+        g.ancestor = anc
+        g.branch_length += node.branch_length
+        if g.label == "":
+            g.label = node.label
+    return new_root
+
+
+def reroot_on_branch(node: Node, distance: float = None) -> Node:
+    """
+    reroot the tree on the branch connecting the node to its ancestor, at the given distance from the node
+    (the midpoint of the branch by default), returning the new root
+    """
+    anc = node.ancestor
+    if anc is None:
+        raise ValueError("Cannot root on the branch below the root")
+    if distance is None:
+        distance = node.branch_length / 2
+    if not 0 <= distance <= node.branch_length:
+        raise ValueError("Distance must be between 0 and the length of the branch")
+    new_node = Node()
+    anc.descendants[anc.descendants.index(node)] = new_node
+    new_node.ancestor = anc
+    new_node.branch_length = node.branch_length - distance
+    new_node.label = node.label
+    new_node.add_child(node)
+    node.branch_length = distance
+    return reroot(new_node)
+
+
 def main():
     """
     some basic code tests